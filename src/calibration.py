@@ -0,0 +1,145 @@
+import os
+import hashlib
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .drift_detection import _bin_codes, _feature_edges, _psi_from_props, jensen_shannon_divergence
+from .utils import ensure_dir, read_json, write_json
+
+logger = logging.getLogger(__name__)
+
+def baseline_hash(baseline: pd.DataFrame, cols: List[str]) -> str:
+    h = hashlib.sha256(",".join(cols).encode())
+    h.update(pd.util.hash_pandas_object(baseline[cols], index=False).values.tobytes())
+    return h.hexdigest()
+
+def _cache_path(cache_dir: str, digest: str) -> str:
+    return os.path.join(cache_dir, f"thresholds_{digest[:16]}.json")
+
+def _bootstrap_codes(codes: np.ndarray, n_bins: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Codes with missing values (-1) moved to a trailing bin that is dropped after counting, plus reference counts."""
+    codes = np.where(codes < 0, n_bins, codes)
+    return codes, np.bincount(codes, minlength=n_bins + 1)[:n_bins].astype(float)
+
+class _NullStat(NamedTuple):
+    feature: str
+    key: str
+    statistic: Callable[[np.ndarray, np.ndarray], np.ndarray]
+    codes: np.ndarray
+    ref_counts: np.ndarray
+
+def _js_stat(ref_counts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    return np.asarray(jensen_shannon_divergence(ref_counts, counts))
+
+def _psi_stat(ref_counts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    return np.asarray(_psi_from_props(ref_counts / (ref_counts.sum(axis=1, keepdims=True) + 1e-12),
+                                      counts / (counts.sum(axis=1, keepdims=True) + 1e-12)))
+
+def _null_stats(baseline: pd.DataFrame, numeric_cols: List[str], cat_cols: List[str]) -> List[_NullStat]:
+    stats = []
+    for c in numeric_cols:
+        values = baseline[c].to_numpy(dtype=float)
+        if np.isnan(values).all():
+            continue
+        js_inner, psi_inner = _feature_edges(values)
+        js_codes, js_ref = _bootstrap_codes(_bin_codes(values, js_inner), n_bins=js_inner.size + 1)
+        psi_codes, psi_ref = _bootstrap_codes(_bin_codes(values, psi_inner), n_bins=psi_inner.size + 1)
+        stats.append(_NullStat(c, "js_divergence_gt", _js_stat, js_codes, js_ref))
+        stats.append(_NullStat(c, "psi_gt", _psi_stat, psi_codes, psi_ref))
+    for c in cat_cols:
+        cats = pd.Index(pd.unique(baseline[c].dropna()))
+        if len(cats) == 0:
+            continue
+        codes, ref = _bootstrap_codes(cats.get_indexer(baseline[c]), n_bins=len(cats))
+        stats.append(_NullStat(c, "js_divergence_gt", _js_stat, codes, ref))
+        stats.append(_NullStat(c, "psi_gt", _psi_stat, codes, ref))
+    return stats
+
+def _null_matrix(stats: List[_NullStat], n_rows: int, *, window_size: int, n_resamples: int, batch_size: int,
+                 rng: np.random.Generator) -> np.ndarray:
+    """(n_resamples, n_stats) bootstrap null of every statistic.
+
+    All statistics of a resample see the same rows, so correlation between features is kept. The
+    reference histogram is redrawn too (multinomial of baseline size), so the null covers the
+    baseline's own sampling noise and not just the window's.
+    """
+    null = np.empty((n_resamples, len(stats)))
+    done = 0
+    while done < n_resamples:
+        b = min(batch_size, n_resamples - done)
+        rows = rng.integers(0, n_rows, size=(b, window_size))
+        for j, st in enumerate(stats):
+            n_bins = st.ref_counts.size
+            flat = (np.arange(b)[:, None] * (n_bins + 1) + st.codes[rows]).ravel()
+            counts = np.bincount(flat, minlength=b * (n_bins + 1)).reshape(b, n_bins + 1)[:, :n_bins].astype(float)
+            n_ref = int(st.ref_counts.sum())
+            ref = rng.multinomial(n_ref, st.ref_counts / n_ref, size=b).astype(float)
+            null[done:done + b, j] = st.statistic(ref, counts)
+        done += b
+    return null
+
+def _window_level_thresholds(null: np.ndarray, alpha: float) -> np.ndarray:
+    """Per-statistic thresholds whose union is exceeded by an ``alpha`` share of null windows.
+
+    Max-T on ranks: each column is ranked, the per-resample maximum rank is taken, and every
+    column is cut at the same rank level, namely the ``1 - alpha`` quantile of that maximum.
+    """
+    n = null.shape[0]
+    ranks = null.argsort(axis=0).argsort(axis=0)
+    level = np.quantile(ranks.max(axis=1), 1 - alpha) / (n - 1)
+    return np.quantile(null, level, axis=0)
+
+def calibrate_thresholds(baseline: pd.DataFrame, numeric_cols: List[str], cat_cols: List[str], window_size: int,
+                         n_resamples: int = 5000, batch_size: int = 500, quantile: float = 0.99,
+                         random_state: int = 42) -> Dict[str, Dict]:
+    """Per-feature thresholds giving a window-level false-alarm rate of about ``1 - quantile``.
+
+    Each batch draws ``batch_size`` windows of ``window_size`` baseline rows with replacement as one
+    2-D index array and histograms every feature with a single bincount. Half of the false-alarm
+    budget goes to JS/PSI, cut jointly across all features (see ``_window_level_thresholds``); the
+    other half is split Bonferroni-style over the per-feature KS / chi-square p-value tests, since
+    ``compute_drift_*`` and ``summarize_breaches`` OR all of them together.
+    Numeric features are binned with the same edges as segment drift (``_feature_edges``).
+    """
+    alpha = 1.0 - quantile
+    stats = _null_stats(baseline, numeric_cols, cat_cols)
+    if not stats:
+        return {}
+    null = _null_matrix(stats, len(baseline), window_size=window_size, n_resamples=n_resamples,
+                        batch_size=batch_size, rng=np.random.default_rng(random_state))
+    cutoffs = _window_level_thresholds(null, alpha / 2)
+    features = list(dict.fromkeys(st.feature for st in stats))
+    pvalue_lt = alpha / 2 / len(features)
+    out: Dict[str, Dict] = {c: {"ks_pvalue_lt": pvalue_lt} if c in numeric_cols else {"chi2_pvalue_lt": pvalue_lt}
+                            for c in features}
+    for st, cut in zip(stats, cutoffs):
+        out[st.feature][st.key] = float(cut)
+    return out
+
+def calibrate_and_cache(baseline: pd.DataFrame, numeric_cols: List[str], cat_cols: List[str], window_size: int,
+                        calcfg: Dict, random_state: int = 42, n_resamples: Optional[int] = None) -> str:
+    """Calibrate for ``window_size`` with the ``drift.calibration`` settings and write the cache file."""
+    n_resamples = n_resamples or calcfg.get("n_resamples", 5000)
+    quantile = calcfg.get("quantile", 0.99)
+    features = calibrate_thresholds(baseline, numeric_cols, cat_cols, window_size, n_resamples=n_resamples,
+                                    batch_size=calcfg.get("batch_size", 500), quantile=quantile,
+                                    random_state=random_state)
+    return save_thresholds(calcfg["cache_dir"], baseline_hash(baseline, numeric_cols + cat_cols), window_size, features,
+                           meta={"n_resamples": n_resamples, "quantile": quantile})
+
+def save_thresholds(cache_dir: str, digest: str, window_size: int, features: Dict[str, Dict], meta: Optional[Dict] = None) -> str:
+    ensure_dir(cache_dir)
+    path = _cache_path(cache_dir, digest)
+    write_json(path, {"baseline_hash": digest, "window_size": window_size, **(meta or {}), "features": features})
+    return path
+
+def load_cached_thresholds(cache_dir: str, digest: str) -> Optional[Dict]:
+    path = _cache_path(cache_dir, digest)
+    if not os.path.exists(path):
+        return None
+    cached = read_json(path)
+    if cached.get("baseline_hash") != digest:
+        logger.warning(f"Threshold cache {path} does not match baseline hash; ignoring")
+        return None
+    return cached
@@ -1,13 +1,30 @@
 import argparse, os, sys
+from datetime import date, datetime
+from typing import NoReturn, Optional
 from .monitor import monitor
 from .model_training import train_and_save
-from .utils import load_config, setup_logger
+from .utils import load_config, setup_logger, list_stream_files
+from .calibration import calibrate_and_cache
+from .history import HistoryStore, METRIC_COLUMNS
 import pandas as pd
 
-def die(msg: str, code: int = 2):
+def die(msg: str, code: int = 2) -> NoReturn:
     print(f"[FATAL] {msg}", file=sys.stderr)
     sys.exit(code)
 
+def parse_when(value: Optional[str], flag: str) -> Optional[date]:
+    """A bare YYYY-MM-DD becomes a date (whole day); anything else must be an ISO timestamp."""
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        die(f"Invalid {flag} value: {value!r}. Use YYYY-MM-DD or an ISO timestamp like 2025-08-01T12:00:00Z.")
+
 def main():
     parser = argparse.ArgumentParser(description="Drift Monitoring CLI")
     sub = parser.add_subparsers(dest="cmd")
@@ -18,6 +35,20 @@ def main():
     initm = sub.add_parser("init-model", help="Train initial model on baseline")
     initm.add_argument("--config", required=True)
 
+    cal = sub.add_parser("calibrate-thresholds", help="Bootstrap per-feature drift thresholds for the baseline")
+    cal.add_argument("--config", required=True)
+    cal.add_argument("--window-size", type=int, default=None,
+                     help="Rows per window (default: drift.window_size, else size of the first stream file)")
+    cal.add_argument("--n-resamples", type=int, default=None)
+
+    hist = sub.add_parser("history", help="Query stored per-window drift metrics")
+    hist.add_argument("--config", required=True)
+    hist.add_argument("--feature", default=None)
+    hist.add_argument("--segment", default=None, help='e.g. "cat=A"; omit for all rows')
+    hist.add_argument("--since", default=None, help="YYYY-MM-DD or ISO timestamp (UTC)")
+    hist.add_argument("--until", default=None, help="YYYY-MM-DD or ISO timestamp (UTC)")
+    hist.add_argument("--metrics", default=None, help=f"Comma-separated subset of: {','.join(METRIC_COLUMNS + ['breach'])}")
+
     args = parser.parse_args()
     if args.cmd == "run-monitor":
         if not os.path.exists(args.config):
@@ -44,6 +75,45 @@ def main():
             random_state=cfg["retraining"]["random_state"],
             extra_meta={"notes": "Initial model"}
         )
+    elif args.cmd == "calibrate-thresholds":
+        if not os.path.exists(args.config):
+            die(f'Config not found: {args.config}.')
+        cfg = load_config(args.config)
+        setup_logger(cfg["output_dirs"]["logs_dir"])
+        baseline_path = cfg["data"]["baseline_path"]
+        if not os.path.exists(baseline_path):
+            die(f'Baseline not found: {baseline_path}. Generate data first: "python -m src.data_generator --out data"')
+        calcfg = cfg["drift"].get("calibration") or {}
+        if not calcfg.get("cache_dir"):
+            die("drift.calibration.cache_dir is not set in config.")
+        df = pd.read_csv(baseline_path)
+        numeric_cols = [c for c in cfg["retraining"]["numeric_columns"] if c in df.columns]
+        cat_cols = [c for c in cfg["retraining"]["cat_columns"] if c in df.columns]
+        window_size = args.window_size or cfg["drift"].get("window_size")
+        if not window_size:
+            stream_files = list_stream_files(cfg["data"]["stream_dir"], cfg["data"]["stream_pattern"]) if os.path.isdir(cfg["data"]["stream_dir"]) else []
+            if not stream_files:
+                die("Cannot infer window size: set drift.window_size or pass --window-size.")
+            window_size = len(pd.read_csv(stream_files[0]))
+        path = calibrate_and_cache(df, numeric_cols, cat_cols, int(window_size), calcfg,
+                                   random_state=cfg["retraining"]["random_state"], n_resamples=args.n_resamples)
+        print(f"Wrote calibrated thresholds for window size {window_size} to {path}")
+    elif args.cmd == "history":
+        if not os.path.exists(args.config):
+            die(f'Config not found: {args.config}.')
+        cfg = load_config(args.config)
+        metrics = args.metrics.split(",") if args.metrics else METRIC_COLUMNS + ["breach"]
+        unknown = [m for m in metrics if m not in METRIC_COLUMNS + ["breach"]]
+        if unknown:
+            die(f"Unknown metrics: {', '.join(unknown)}")
+        since, until = parse_when(args.since, "--since"), parse_when(args.until, "--until")
+        store = HistoryStore(cfg["output_dirs"].get("history_dir", "outputs/history"))
+        df = store.query(feature=args.feature, since=since, until=until, segment=args.segment,
+                         columns=["ts", "window", "source", "feature", "segment"] + metrics)
+        if df.empty:
+            print("No history rows match.")
+        else:
+            print(df.to_string(index=False))
     else:
         parser.print_help()
 
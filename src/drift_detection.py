@@ -1,4 +1,4 @@
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple, Union
 import numpy as np
 import pandas as pd
 from scipy import stats
@@ -14,15 +14,19 @@ def _histogram(a: np.ndarray, bins: int = 20):
     hist = hist / (hist.sum() + 1e-12)
     return hist, bin_edges
 
-def jensen_shannon_divergence(p: np.ndarray, q: np.ndarray) -> float:
-    p = p / (p.sum() + 1e-12)
-    q = q / (q.sum() + 1e-12)
+def jensen_shannon_divergence(p: np.ndarray, q: np.ndarray) -> Union[float, np.ndarray]:
+    # Reduces over the last axis, so 2-D inputs give one divergence per row.
+    p = p / (p.sum(axis=-1, keepdims=True) + 1e-12)
+    q = q / (q.sum(axis=-1, keepdims=True) + 1e-12)
     m = 0.5 * (p + q)
     def kl(a, b):
         a = np.where(a==0, 1e-12, a); b = np.where(b==0, 1e-12, b)
-        return np.sum(a * np.log(a / b))
+        return np.sum(a * np.log(a / b), axis=-1)
     return 0.5 * (kl(p, m) + kl(q, m))
 
+def _psi_from_props(e_prop: np.ndarray, a_prop: np.ndarray) -> Union[float, np.ndarray]:
+    return np.sum((a_prop - e_prop) * np.log((a_prop + 1e-12) / (e_prop + 1e-12)), axis=-1)
+
 def population_stability_index(expected: np.ndarray, actual: np.ndarray, bins: int = 10) -> float:
     expected = expected[~np.isnan(expected)]
     actual = actual[~np.isnan(actual)]
@@ -34,8 +38,8 @@ def population_stability_index(expected: np.ndarray, actual: np.ndarray, bins: i
     a_counts = np.histogram(actual, bins=quantiles)[0]
     e_prop = e_counts / (e_counts.sum() + 1e-12)
     a_prop = a_counts / (a_counts.sum() + 1e-12)
-    psi = np.sum((a_prop - e_prop) * np.log((a_prop + 1e-12) / (e_prop + 1e-12)))
-    return psi
+    psi = _psi_from_props(e_prop, a_prop)
+    return float(psi)
 
 def chi_square_test(expected_counts: np.ndarray, observed_counts: np.ndarray) -> Tuple[float, float]:
     mask = expected_counts > 0
@@ -78,7 +82,7 @@ def compute_drift_categorical(baseline: pd.Series, current: pd.Series, threshold
     e_prop = e / (e.sum() + 1e-12); o_prop = o / (o.sum() + 1e-12)
     js = jensen_shannon_divergence(e_prop, o_prop)
     chi2, p = chi_square_test(e, o)
-    psi = np.sum((o_prop - e_prop) * np.log((o_prop + 1e-12) / (e_prop + 1e-12)))
+    psi = _psi_from_props(e_prop, o_prop)
     breach = (
         (p==p and p < thresholds.get("chi2_pvalue_lt", 0.05)) or
         (js==js and js > thresholds.get("js_divergence_gt", 0.1)) or
@@ -91,11 +95,141 @@ def compute_drift_categorical(baseline: pd.Series, current: pd.Series, threshold
             "breach": bool(breach)}
 
 def summarize_breaches(per_feature: Dict[str, Dict], rule: str = "any") -> bool:
-    breaches = [m.get("breach", False) for m in per_feature.values()]
+    """Apply ``rule`` to the global per-feature entries, then OR in any segment-level breach.
+
+    Segment entries (those carrying a ``"segment"`` key) never vote in the majority, so the window
+    decision does not depend on how many segments exist.
+    """
+    breaches = [m.get("breach", False) for m in per_feature.values() if "segment" not in m]
+    segment_breach = any(m.get("breach", False) for m in per_feature.values() if "segment" in m)
     if not breaches:
-        return False
+        return segment_breach
     if rule == "any":
-        return any(breaches)
+        return any(breaches) or segment_breach
     if rule == "majority":
-        return sum(breaches) >= (len(breaches) / 2.0)
-    return any(breaches)
+        return sum(breaches) >= (len(breaches) / 2.0) or segment_breach
+    return any(breaches) or segment_breach
+
+def _bin_codes(values: np.ndarray, inner_edges: np.ndarray) -> np.ndarray:
+    values = values.astype(float)
+    codes = np.searchsorted(inner_edges, values, side="right")
+    codes[np.isnan(values)] = -1
+    return codes
+
+def _feature_edges(values: np.ndarray, js_bins: int = 20, psi_bins: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """Inner bin edges of a baseline numeric feature: equal-width for JS, baseline quantiles for PSI."""
+    _, js_edges = _histogram(values, bins=js_bins)
+    finite = values[~np.isnan(values)]
+    psi_edges = np.quantile(finite, np.linspace(0, 1, psi_bins + 1)) if finite.size else np.linspace(0, 1, psi_bins + 1)
+    return js_edges[1:-1], psi_edges[1:-1]
+
+def _grouped_counts(seg_codes: np.ndarray, bin_codes: np.ndarray, n_segments: int, n_bins: int) -> np.ndarray:
+    # One bincount over (segment, bin) pairs: cost is linear in rows, whatever the segment count.
+    mask = (seg_codes >= 0) & (bin_codes >= 0)
+    flat = seg_codes[mask] * n_bins + bin_codes[mask]
+    return np.bincount(flat, minlength=n_segments * n_bins).reshape(n_segments, n_bins).astype(float)
+
+def _chi_square_rows(expected_counts: np.ndarray, observed_counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Two-sample homogeneity test per row: segment baselines are small, so their own noise must count.
+    col = expected_counts + observed_counts
+    e_tot = expected_counts.sum(axis=1, keepdims=True); o_tot = observed_counts.sum(axis=1, keepdims=True)
+    n = e_tot + o_tot
+    mask = col > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exp_e = e_tot * col / n; exp_o = o_tot * col / n
+        terms = (expected_counts - exp_e) ** 2 / exp_e + (observed_counts - exp_o) ** 2 / exp_o
+    chi2 = np.sum(np.where(mask, terms, 0.0), axis=1)
+    dof = mask.sum(axis=1) - 1
+    p = stats.chi2.sf(chi2, np.maximum(dof, 1))
+    invalid = (e_tot[:, 0] == 0) | (o_tot[:, 0] == 0)
+    chi2 = np.where(invalid, np.nan, chi2)
+    p = np.where(invalid | (dof < 1), np.nan, p)
+    return chi2, p
+
+def build_segment_profile(baseline: pd.DataFrame, segment_col: str, numeric_cols: List[str],
+                          cat_cols: List[str], js_bins: int = 20, psi_bins: int = 10) -> Dict:
+    """Per-segment baseline histograms for every feature, built once and reused for each window.
+
+    Bin edges come from the whole baseline so segment histograms are comparable; values outside
+    the baseline range fall into the outermost bins.
+    """
+    segments = pd.Index(pd.unique(baseline[segment_col].dropna()))
+    seg_codes = segments.get_indexer(baseline[segment_col])
+    profile = {"column": segment_col, "segments": segments, "numeric": {}, "categorical": {}}
+    for c in numeric_cols:
+        if c == segment_col:
+            continue
+        values = baseline[c].values.astype(float)
+        js_inner, psi_inner = _feature_edges(values, js_bins=js_bins, psi_bins=psi_bins)
+        profile["numeric"][c] = {
+            "js_edges": js_inner, "psi_edges": psi_inner,
+            "js_counts": _grouped_counts(seg_codes, _bin_codes(values, js_inner), len(segments), js_bins),
+            "psi_counts": _grouped_counts(seg_codes, _bin_codes(values, psi_inner), len(segments), psi_bins),
+        }
+    for c in cat_cols:
+        if c == segment_col:
+            continue
+        categories = pd.Index(pd.unique(baseline[c].dropna()))
+        profile["categorical"][c] = {
+            "categories": categories,
+            "counts": _grouped_counts(seg_codes, categories.get_indexer(baseline[c]), len(segments), len(categories)),
+        }
+    return profile
+
+def _segment_metric(arr: np.ndarray, i: int):
+    v = arr[i]
+    return float(v) if v == v else None
+
+def _smoothed_props(counts: np.ndarray, pseudo_count: float) -> np.ndarray:
+    # Small segments leave bins empty; a pseudo-count keeps one empty bin from dominating PSI/JS.
+    counts = counts + pseudo_count
+    return counts / counts.sum(axis=1, keepdims=True)
+
+def compute_drift_segmented(profile: Dict, current: pd.DataFrame, thresholds: Dict, min_rows: int = 200,
+                            pseudo_count: float = 0.5) -> Dict[str, Dict]:
+    """Drift of every feature within every baseline segment, from one grouped pass over the window.
+
+    Keys are ``"<feature>[<segment_col>=<value>]"`` so results can sit next to the global entries in
+    the per-feature report. A (segment, feature) pair is skipped unless it has at least ``min_rows``
+    non-null values in both the baseline and the window; categories unseen in the baseline are
+    ignored at segment level. Histograms are smoothed with ``pseudo_count`` per bin, and the
+    chi-square p-value threshold is Bonferroni-corrected across the segments tested for a feature.
+    Numeric features use JS and PSI only (no per-segment KS), which keeps the pass histogram-based.
+    """
+    segment_col = profile["column"]
+    segments = profile["segments"]
+    n_seg = len(segments)
+    seg_codes = segments.get_indexer(current[segment_col])
+    unseen = int((seg_codes < 0).sum())
+    if unseen:
+        logger.info(f"{unseen} rows with segment values unseen in baseline for '{segment_col}'")
+    results = {}
+    def add(feature, metrics, breach, active):
+        for i in np.flatnonzero(active):
+            entry = {k: _segment_metric(v, i) for k, v in metrics.items()}
+            entry.update({"feature": feature, "segment": {segment_col: segments[i]}, "breach": bool(breach[i])})
+            results[f"{feature}[{segment_col}={segments[i]}]"] = entry
+    def gate(base_counts, curr_counts):
+        return (base_counts.sum(axis=1) >= min_rows) & (curr_counts.sum(axis=1) >= min_rows)
+    for c, prof in profile["numeric"].items():
+        values = current[c].values.astype(float)
+        js_curr = _grouped_counts(seg_codes, _bin_codes(values, prof["js_edges"]), n_seg, prof["js_counts"].shape[1])
+        psi_curr = _grouped_counts(seg_codes, _bin_codes(values, prof["psi_edges"]), n_seg, prof["psi_counts"].shape[1])
+        active = gate(prof["js_counts"], js_curr)
+        js = jensen_shannon_divergence(_smoothed_props(prof["js_counts"], pseudo_count), _smoothed_props(js_curr, pseudo_count))
+        psi = _psi_from_props(_smoothed_props(prof["psi_counts"], pseudo_count), _smoothed_props(psi_curr, pseudo_count))
+        breach = (js > thresholds.get("js_divergence_gt", 0.1)) | (psi > thresholds.get("psi_gt", 0.25))
+        add(c, {"js_divergence": js, "psi": psi}, breach, active)
+    for c, prof in profile["categorical"].items():
+        e = prof["counts"]
+        o = _grouped_counts(seg_codes, prof["categories"].get_indexer(current[c]), n_seg, e.shape[1])
+        active = gate(e, o)
+        e_prop = _smoothed_props(e, pseudo_count); o_prop = _smoothed_props(o, pseudo_count)
+        js = jensen_shannon_divergence(e_prop, o_prop)
+        psi = _psi_from_props(e_prop, o_prop)
+        chi2, p = _chi_square_rows(e, o)
+        alpha = thresholds.get("chi2_pvalue_lt", 0.05) / max(int(active.sum()), 1)
+        breach = ((p == p) & (p < alpha)) | \
+                 (js > thresholds.get("js_divergence_gt", 0.1)) | (psi > thresholds.get("psi_gt", 0.25))
+        add(c, {"chi2": chi2, "chi2_pvalue": p, "js_divergence": js, "psi": psi}, breach, active)
+    return results
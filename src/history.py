@@ -0,0 +1,139 @@
+import os
+import uuid
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+METRIC_COLUMNS = ["ks_stat", "ks_pvalue", "chi2", "chi2_pvalue", "js_divergence", "psi"]
+
+SCHEMA = pa.schema(
+    [("ts", pa.timestamp("us", tz="UTC")), ("run_id", pa.string()), ("window", pa.int64()),
+     ("source", pa.string()), ("feature", pa.string()), ("segment", pa.string())]
+    + [(m, pa.float64()) for m in METRIC_COLUMNS]
+    + [("breach", pa.bool_()), ("data_drift", pa.bool_()), ("concept_drift", pa.bool_())]
+)
+
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+def _as_utc(when: date) -> datetime:
+    if not isinstance(when, datetime):
+        when = datetime.combine(when, time.min)
+    return when.replace(tzinfo=timezone.utc) if when.tzinfo is None else when.astimezone(timezone.utc)
+
+class HistoryStore:
+    """Append-only Parquet store of per-window, per-feature drift metrics, partitioned by UTC date.
+
+    Each window is written as one file under ``<root>/date=YYYY-MM-DD/``. Once a day is over its files
+    are merged into one (``compact``), so a long watch keeps one file per day. Queries with
+    ``since``/``until`` only list the matching ``date=`` directories and read only the requested columns.
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self._open_day: Optional[str] = None
+
+    def _days(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d[len("date="):] for d in os.listdir(self.root) if d.startswith("date="))
+
+    def _files(self, day: str) -> List[str]:
+        part_dir = os.path.join(self.root, f"date={day}")
+        return sorted(os.path.join(part_dir, f) for f in os.listdir(part_dir) if f.endswith(".parquet"))
+
+    def compact(self, before: Optional[date] = None) -> int:
+        """Merge each day's files into one for every day strictly before ``before`` (default: today UTC).
+
+        The merged file is written under a hidden name, renamed into place, then the originals are
+        removed. A crash between the rename and the removal can leave duplicate rows for that day.
+        Returns the number of days compacted.
+        """
+        cutoff = f"{(before or datetime.now(timezone.utc).date()):%Y-%m-%d}"
+        compacted = 0
+        for day in self._days():
+            if day >= cutoff:
+                continue
+            files = self._files(day)
+            if len(files) < 2:
+                continue
+            part_dir = os.path.join(self.root, f"date={day}")
+            tmp = os.path.join(part_dir, f".compact-{uuid.uuid4().hex[:8]}.tmp")
+            pq.write_table(pa.concat_tables(pq.read_table(f, schema=SCHEMA) for f in files), tmp)
+            os.replace(tmp, os.path.join(part_dir, f"part-compacted-{uuid.uuid4().hex[:8]}.parquet"))
+            for f in files:
+                os.remove(f)
+            compacted += 1
+        if compacted:
+            logger.info(f"Compacted {compacted} history day(s) under {self.root}")
+        return compacted
+
+    def append(self, run_id: str, window: int, source: str, per_feature: Dict[str, Dict],
+               data_drift: bool, concept_drift: bool, ts: Optional[datetime] = None) -> str:
+        ts = ts or datetime.now(timezone.utc)
+        rows = []
+        for key, m in per_feature.items():
+            segment = m.get("segment")
+            rows.append({
+                "ts": ts, "run_id": run_id, "window": window, "source": source,
+                "feature": m.get("feature", key),
+                "segment": ",".join(f"{k}={v}" for k, v in segment.items()) if segment else None,
+                **{c: m.get(c) for c in METRIC_COLUMNS},
+                "breach": bool(m.get("breach", False)),
+                "data_drift": bool(data_drift), "concept_drift": bool(concept_drift),
+            })
+        day = f"{ts.astimezone(timezone.utc):%Y-%m-%d}"
+        if day != self._open_day:
+            # First write of this process or a new day: earlier days are complete and can be merged
+            self.compact(before=date.fromisoformat(day))
+            self._open_day = day
+        part_dir = os.path.join(self.root, f"date={day}")
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, f"part-{run_id}-{window:06d}-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(pa.Table.from_pylist(rows, schema=SCHEMA), path)
+        return path
+
+    def query(self, feature: Optional[str] = None, since: Optional[date] = None, until: Optional[date] = None,
+              segment: Optional[str] = None, columns: Optional[List[str]] = None,
+              run_id: Optional[str] = None) -> pd.DataFrame:
+        """Rows matching the filters.
+
+        ``since``/``until`` are inclusive; a ``date`` covers the whole UTC day, a ``datetime`` is exact
+        (naive values are taken as UTC).
+        """
+        cols = columns or list(SCHEMA.names)
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=cols)
+        cond = None
+        def both(c, x):
+            return x if c is None else c & x
+        days = self._days()
+        if since is not None:
+            start = _as_utc(since)
+            days = [d for d in days if d >= f"{start:%Y-%m-%d}"]
+            cond = both(cond, ds.field("ts") >= start)
+        if until is not None:
+            end = _as_utc(until)
+            if not isinstance(until, datetime):
+                end = end + timedelta(days=1) - timedelta(microseconds=1)
+            days = [d for d in days if d <= f"{end:%Y-%m-%d}"]
+            cond = both(cond, ds.field("ts") <= end)
+        # Only the selected date= directories are listed; other partitions are never touched
+        files = [f for d in days for f in self._files(d)]
+        if not files:
+            return pd.DataFrame(columns=cols)
+        dataset = ds.dataset(files, schema=SCHEMA.append(pa.field("date", pa.string())), format="parquet",
+                             partitioning=PARTITIONING, partition_base_dir=self.root)
+        if feature is not None:
+            cond = both(cond, ds.field("feature") == feature)
+        if segment is not None:
+            cond = both(cond, ds.field("segment") == segment)
+        if run_id is not None:
+            cond = both(cond, ds.field("run_id") == run_id)
+        df = dataset.to_table(columns=cols, filter=cond).to_pandas()
+        sort = [c for c in ("ts", "window") if c in df.columns]
+        return df.sort_values(sort, kind="stable").reset_index(drop=True) if sort else df
@@ -1,14 +1,19 @@
 import os
 import pandas as pd
 import numpy as np
+import uuid
 import logging
-from typing import List
+from collections import deque
+from typing import Dict, List, Optional, Tuple
 from .utils import load_config, ensure_dir, setup_logger, list_stream_files
 from .data_ingestion import CSVIngestion
-from .drift_detection import compute_drift_numeric, compute_drift_categorical, summarize_breaches
+from .drift_detection import (compute_drift_numeric, compute_drift_categorical, summarize_breaches,
+                              build_segment_profile, compute_drift_segmented)
 from .concept_drift import ConceptDriftDetector
 from .model_training import load_latest_model, train_and_save
 from .alerting import alert
+from .calibration import baseline_hash, calibrate_and_cache, load_cached_thresholds
+from .history import HistoryStore
 from .visualization import plot_metric_over_time
 
 logger = logging.getLogger(__name__)
@@ -18,6 +23,28 @@ def _split_cols(df: pd.DataFrame, numeric_cols: List[str], cat_cols: List[str]):
     cat = [c for c in cat_cols if c in df.columns]
     return num, cat
 
+def _feature_thresholds(calcfg: Dict, baseline: pd.DataFrame, cols: List[str], thresholds: Dict) -> Tuple[Dict[str, Dict], Optional[int]]:
+    """Config thresholds per feature, overridden by calibrated ones cached for this exact baseline.
+
+    Also returns the window size the calibration was run for (None when config thresholds are used).
+    """
+    cached = None
+    if calcfg.get("cache_dir"):
+        cached = load_cached_thresholds(calcfg["cache_dir"], baseline_hash(baseline, cols))
+    if cached is None:
+        logger.info("No calibrated thresholds for this baseline; using config thresholds")
+        return {c: thresholds for c in cols}, None
+    logger.info(f"Using calibrated thresholds (window_size={cached['window_size']}) for baseline {cached['baseline_hash'][:16]}")
+    return {c: {**thresholds, **cached["features"].get(c, {})} for c in cols}, int(cached["window_size"])
+
+def _window_thresholds(feature_thresholds: Dict[str, Dict], calibrated_size: Optional[int], n_rows: int,
+                       tolerance: float, thresholds: Dict) -> Dict[str, Dict]:
+    """Calibrated thresholds only hold for windows near the calibrated size; otherwise use config ones."""
+    if calibrated_size and abs(n_rows - calibrated_size) > tolerance * calibrated_size:
+        logger.warning(f"Window has {n_rows} rows but thresholds were calibrated for {calibrated_size}; using config thresholds")
+        return {c: thresholds for c in feature_thresholds}
+    return feature_thresholds
+
 def monitor(config_path: str):
     cfg = load_config(config_path)
     setup_logger(cfg["output_dirs"]["logs_dir"])
@@ -39,28 +66,52 @@ def monitor(config_path: str):
     model = load_latest_model(cfg["output_dirs"]["models_dir"])
     if model is None:
         logger.warning("No model found in models/. Did you run init-model?")
-    # State
-    data_drift_windows = []
-    concept_drift_windows = []
-    per_feature_history = {c: [] for c in numeric_cols + cat_cols}
+    # State: full results go to the history store; only the last chart_windows are kept in memory
+    histcfg = cfg.get("history") or {}
+    history = HistoryStore(cfg["output_dirs"].get("history_dir", "outputs/history"))
+    run_id = uuid.uuid4().hex[:12]
+    chart_windows = histcfg.get("chart_windows", 500)
+    data_drift_windows: deque[int] = deque(maxlen=chart_windows)
+    concept_drift_windows: deque[int] = deque(maxlen=chart_windows)
+    per_feature_history: Dict[str, deque[float]] = {c: deque(maxlen=chart_windows) for c in numeric_cols + cat_cols}
+    n_windows = n_data_drift = n_concept_drift = 0
     consecutive_breaches = 0
     # Stream files
     stream_files = list_stream_files(cfg["data"]["stream_dir"], cfg["data"]["stream_pattern"]) or []
     if not stream_files:
         raise FileNotFoundError(f'No stream files found under {cfg["data"]["stream_dir"]}. Did you run data_generator?')
     thresholds = cfg["drift"]["thresholds"]
+    calcfg = cfg["drift"].get("calibration") or {}
+    window_tolerance = calcfg.get("window_tolerance", 0.1)
+    feature_thresholds, calibrated_size = _feature_thresholds(calcfg, baseline, numeric_cols + cat_cols, thresholds)
     aggregate_rule = cfg["drift"].get("aggregate_rule", "any")
+    segcfg = cfg["drift"].get("segments") or {}
+    segment_cols = [c for c in segcfg.get("columns", []) if c in baseline.columns]
+    segment_min_rows = segcfg.get("min_rows", 200)
+    segment_profiles = {s: build_segment_profile(baseline, s, numeric_cols, cat_cols) for s in segment_cols}
     for i, path in enumerate(stream_files, start=1):
         df = pd.read_csv(path)
         logger.info(f"Processing {path} ({len(df)} rows)")
         # Data drift per feature
+        window_thresholds = _window_thresholds(feature_thresholds, calibrated_size, len(df), window_tolerance, thresholds)
         per_feature = {}
         for c in numeric_cols:
-            per_feature[c] = compute_drift_numeric(baseline[c], df[c], thresholds)
+            per_feature[c] = compute_drift_numeric(baseline[c], df[c], window_thresholds[c])
             per_feature_history[c].append(per_feature[c]["js_divergence"] if per_feature[c]["js_divergence"] is not None else np.nan)
         for c in cat_cols:
-            per_feature[c] = compute_drift_categorical(baseline[c], df[c], thresholds)
+            per_feature[c] = compute_drift_categorical(baseline[c], df[c], window_thresholds[c])
             per_feature_history[c].append(per_feature[c]["js_divergence"] if per_feature[c]["js_divergence"] is not None else np.nan)
+        for s, profile in segment_profiles.items():
+            if s not in df.columns:
+                logger.warning(f"Segment column '{s}' missing from {path}; skipping segment drift")
+                continue
+            # Calibrated thresholds are for whole windows of the calibrated size; segments are smaller and
+            # vary in size, so they use config thresholds behind the min_rows gate, smoothing and Bonferroni.
+            seg_results = compute_drift_segmented(profile, df, thresholds, min_rows=segment_min_rows)
+            breached = [k for k, m in seg_results.items() if m["breach"]]
+            if breached:
+                logger.info(f"Segment drift on '{s}': {', '.join(breached)}")
+            per_feature.update(seg_results)
         data_drift = summarize_breaches(per_feature, aggregate_rule)
         data_drift_windows.append(int(data_drift))
         # Concept drift (if labels available and model present)
@@ -76,6 +127,8 @@ def monitor(config_path: str):
                     concept_drift = True
                     break
         concept_drift_windows.append(int(concept_drift))
+        n_windows += 1; n_data_drift += int(data_drift); n_concept_drift += int(concept_drift)
+        history.append(run_id, i, os.path.basename(path), per_feature, data_drift, concept_drift)
         logger.info(f"Data drift: {data_drift} | Concept drift: {concept_drift}")
         # Retraining logic
         retrain_reason = None
@@ -94,6 +147,17 @@ def monitor(config_path: str):
             else:
                 new_baseline = df.copy()
             baseline = new_baseline
+            segment_profiles = {s: build_segment_profile(baseline, s, numeric_cols, cat_cols) for s in segment_cols}
+            # A new baseline has a new hash, so the cached calibration no longer applies
+            previous_size = calibrated_size
+            if previous_size and calcfg.get("recalibrate_on_retrain", False):
+                path = calibrate_and_cache(baseline, numeric_cols, cat_cols, previous_size, calcfg,
+                                           random_state=cfg["retraining"]["random_state"])
+                logger.info(f"Recalibrated thresholds for the retrained baseline: {path}")
+            feature_thresholds, calibrated_size = _feature_thresholds(calcfg, baseline, numeric_cols + cat_cols, thresholds)
+            if previous_size and calibrated_size is None:
+                logger.warning("Retrained baseline has no calibrated thresholds; using config thresholds from now on. "
+                               "Set drift.calibration.recalibrate_on_retrain or rerun calibrate-thresholds.")
             models_dir = cfg["output_dirs"]["models_dir"]
             registry_path = cfg["output_dirs"]["registry_path"]
             model_path, meta = train_and_save(
@@ -111,13 +175,13 @@ def monitor(config_path: str):
         charts_dir = cfg["output_dirs"]["charts_dir"]
         ensure_dir(charts_dir)
         for c in per_feature_history:
-            vals = per_feature_history[c]
+            vals = list(per_feature_history[c])
             out = os.path.join(charts_dir, f"js_{c}.png")
-            plot_metric_over_time(vals, thresholds.get("js_divergence_gt"), title=f"JS divergence for {c}", out_path=out, ylabel="JS", xlabel="window")
+            plot_metric_over_time(vals, feature_thresholds[c].get("js_divergence_gt"), title=f"JS divergence for {c}", out_path=out, ylabel="JS", xlabel="window")
         out = os.path.join(charts_dir, "data_drift_flags.png")
-        plot_metric_over_time(data_drift_windows, threshold=None, title="Data drift flags over time", out_path=out, ylabel="drift_flag")
+        plot_metric_over_time(list(data_drift_windows), threshold=None, title="Data drift flags over time", out_path=out, ylabel="drift_flag")
         out = os.path.join(charts_dir, "concept_drift_flags.png")
-        plot_metric_over_time(concept_drift_windows, threshold=None, title="Concept drift flags over time", out_path=out, ylabel="drift_flag")
+        plot_metric_over_time(list(concept_drift_windows), threshold=None, title="Concept drift flags over time", out_path=out, ylabel="drift_flag")
 
-    if any(data_drift_windows) or any(concept_drift_windows):
-        alert(cfg, "Drift Monitoring Summary", f"Data drift windows: {sum(data_drift_windows)}/{len(data_drift_windows)} | Concept drift windows: {sum(concept_drift_windows)}/{len(concept_drift_windows)}")
+    if n_data_drift or n_concept_drift:
+        alert(cfg, "Drift Monitoring Summary", f"Data drift windows: {n_data_drift}/{n_windows} | Concept drift windows: {n_concept_drift}/{n_windows}")
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+from src.calibration import baseline_hash, calibrate_thresholds, save_thresholds, load_cached_thresholds
+from src.data_generator import generate_day
+from src.drift_detection import compute_drift_numeric, compute_drift_categorical
+
+def test_calibrated_thresholds_roundtrip(tmp_path):
+    rng = np.random.default_rng(0)
+    base = pd.DataFrame({"f1": rng.normal(0,1,5000), "cat": rng.choice(["A","B"], size=5000, p=[0.7,0.3])})
+    th = calibrate_thresholds(base, ["f1"], ["cat"], window_size=500, n_resamples=1000, batch_size=200)
+    assert set(th["f1"]) == {"ks_pvalue_lt", "js_divergence_gt", "psi_gt"}
+    assert set(th["cat"]) == {"chi2_pvalue_lt", "js_divergence_gt", "psi_gt"}
+    digest = baseline_hash(base, ["f1", "cat"])
+    save_thresholds(str(tmp_path), digest, 500, th)
+    assert load_cached_thresholds(str(tmp_path), digest)["features"] == th
+    assert load_cached_thresholds(str(tmp_path), baseline_hash(base.iloc[1:], ["f1", "cat"])) is None
+
+def test_calibrated_thresholds_bound_window_false_alarm_rate():
+    np.random.seed(0)
+    base = pd.concat([generate_day(n=2000) for _ in range(7)], ignore_index=True)
+    th = calibrate_thresholds(base, ["f1","f2","f3"], ["cat"], window_size=1000, n_resamples=2000, quantile=0.9)
+    flags = []
+    for _ in range(150):
+        w = generate_day(n=1000)
+        breaches = [compute_drift_numeric(base[c], w[c], th[c])["breach"] for c in ["f1","f2","f3"]]
+        breaches.append(compute_drift_categorical(base["cat"], w["cat"], th["cat"])["breach"])
+        flags.append(any(breaches))
+    assert np.mean(flags) <= 0.15
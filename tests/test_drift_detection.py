@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
-from src.drift_detection import compute_drift_numeric, compute_drift_categorical
+from src.drift_detection import (compute_drift_numeric, compute_drift_categorical, summarize_breaches,
+                                 build_segment_profile, compute_drift_segmented)
 
 def test_numeric_drift_detects_shift():
     base = pd.Series(np.random.normal(0,1,2000))
@@ -13,3 +14,45 @@ def test_categorical_drift_detects_shift():
     curr = pd.Series(np.random.choice(["A","B"], size=2000, p=[0.5,0.5]))
     res = compute_drift_categorical(base, curr, {"chi2_pvalue_lt":0.05,"js_divergence_gt":0.1,"psi_gt":0.25})
     assert res["breach"] is True
+
+def test_segmented_drift_flags_only_shifted_segment():
+    rng = np.random.default_rng(0)
+    base = pd.DataFrame({"f1": rng.normal(0,1,4000), "cat": rng.choice(["A","B"], size=4000),
+                         "region": rng.choice(["eu","us"], size=4000)})
+    curr = pd.DataFrame({"f1": rng.normal(0,1,4000), "cat": rng.choice(["A","B"], size=4000),
+                         "region": rng.choice(["eu","us"], size=4000)})
+    curr.loc[curr["region"]=="us", "f1"] += 1.5
+    profile = build_segment_profile(base, "region", ["f1"], ["cat"])
+    res = compute_drift_segmented(profile, curr, {"chi2_pvalue_lt":0.01,"js_divergence_gt":0.1,"psi_gt":0.25})
+    assert res["f1[region=us]"]["breach"] is True
+    assert res["f1[region=eu]"]["breach"] is False
+    assert res["cat[region=us]"]["breach"] is False
+    assert summarize_breaches(res) is True
+
+def test_segmented_drift_no_false_alarms_with_many_small_segments():
+    rng = np.random.default_rng(1)
+    def frame(n):
+        return pd.DataFrame({"f1": rng.normal(0,1,n), "f2": rng.exponential(1,n),
+                             "cat": rng.choice(["A","B","C"], size=n, p=[0.6,0.3,0.1]), "seg": rng.integers(0,10,n)})
+    profile = build_segment_profile(frame(20000), "seg", ["f1","f2"], ["cat"])
+    thresholds = {"chi2_pvalue_lt":0.05,"js_divergence_gt":0.1,"psi_gt":0.25}
+    for n in (400, 2500, 4000):
+        res = compute_drift_segmented(profile, frame(n), thresholds)
+        assert summarize_breaches(res) is False
+
+def test_segmented_drift_skips_segments_without_enough_values():
+    rng = np.random.default_rng(2)
+    base = pd.DataFrame({"f1": rng.normal(0,1,4000), "region": rng.choice(["eu","us"], size=4000)})
+    curr = pd.DataFrame({"f1": rng.normal(0,1,4000), "region": rng.choice(["eu","us"], size=4000)})
+    curr.loc[curr["region"]=="us", "f1"] = np.nan
+    res = compute_drift_segmented(build_segment_profile(base, "region", ["f1"], []), curr, {})
+    assert "f1[region=us]" not in res
+    assert res["f1[region=eu]"]["breach"] is False
+
+def test_majority_rule_ignores_segment_count():
+    per_feature = {"f1": {"breach": False}, "f2": {"breach": False}, "f3": {"breach": True}}
+    assert summarize_breaches(per_feature, "majority") is False
+    quiet = {f"f1[seg={i}]": {"segment": {"seg": i}, "breach": False} for i in range(10)}
+    assert summarize_breaches({**per_feature, **quiet, "f3[seg=0]": {"segment": {"seg": 0}, "breach": False}}, "majority") is False
+    loud = {**per_feature, "f2[seg=3]": {"segment": {"seg": 3}, "breach": True}}
+    assert summarize_breaches(loud, "majority") is True
@@ -0,0 +1,31 @@
+from datetime import date, datetime, timezone
+from src.history import HistoryStore
+
+def test_history_append_and_query(tmp_path):
+    store = HistoryStore(str(tmp_path / "history"))
+    per_feature = {"f1": {"ks_stat": 0.1, "ks_pvalue": 0.01, "js_divergence": 0.2, "psi": 0.3, "breach": True},
+                   "cat": {"chi2": 5.0, "chi2_pvalue": 0.02, "js_divergence": 0.01, "psi": 0.02, "breach": False},
+                   "f1[cat=A]": {"feature": "f1", "segment": {"cat": "A"}, "js_divergence": 0.4, "psi": 0.5, "breach": True}}
+    store.append("r1", 1, "stream_0001.csv", per_feature, True, False, ts=datetime(2025, 1, 1, tzinfo=timezone.utc))
+    store.append("r1", 2, "stream_0002.csv", per_feature, False, False, ts=datetime(2025, 1, 3, tzinfo=timezone.utc))
+    assert sorted(p.name for p in (tmp_path / "history").iterdir()) == ["date=2025-01-01", "date=2025-01-03"]
+    df = store.query(feature="f1", since=date(2025, 1, 2), columns=["window", "segment", "ks_pvalue", "psi"])
+    assert list(df.columns) == ["window", "segment", "ks_pvalue", "psi"]
+    assert df["window"].tolist() == [2, 2]
+    assert df["ks_pvalue"].iloc[0] == 0.01
+    assert store.query(feature="f1", segment="cat=A", until=date(2025, 1, 1))["psi"].tolist() == [0.5]
+    assert store.query(feature="cat")["chi2"].tolist() == [5.0, 5.0]
+    assert store.query(feature="cat", until=datetime(2025, 1, 2, 12))["window"].tolist() == [1]
+    assert store.query(feature="cat", until=datetime(2025, 1, 3))["window"].tolist() == [1, 2]
+
+def test_history_compacts_finished_days_and_prunes_by_date(tmp_path):
+    root = tmp_path / "history"
+    store = HistoryStore(str(root))
+    per_feature = {"f1": {"js_divergence": 0.2, "breach": False}}
+    for w, day in [(1, 1), (2, 1), (3, 1), (4, 2)]:
+        store.append("r1", w, f"stream_{w:04d}.csv", per_feature, False, False, ts=datetime(2025, 1, day, w, tzinfo=timezone.utc))
+    assert len(list((root / "date=2025-01-01").glob("*.parquet"))) == 1
+    assert len(list((root / "date=2025-01-02").glob("*.parquet"))) == 1
+    assert store.query(feature="f1")["window"].tolist() == [1, 2, 3, 4]
+    (root / "date=2025-01-01" / "part-broken.parquet").write_bytes(b"not parquet")
+    assert store.query(feature="f1", since=date(2025, 1, 2))["window"].tolist() == [4]
@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+from src.calibration import baseline_hash, save_thresholds
+from src.monitor import _feature_thresholds, _window_thresholds
+
+CONFIG = {"ks_pvalue_lt": 0.05, "js_divergence_gt": 0.1, "psi_gt": 0.25}
+
+def test_calibrated_thresholds_fall_back_outside_window_tolerance(tmp_path):
+    base = pd.DataFrame({"f1": np.random.default_rng(0).normal(0,1,500)})
+    save_thresholds(str(tmp_path), baseline_hash(base, ["f1"]), 2000, {"f1": {"js_divergence_gt": 0.003}})
+    feature_th, size = _feature_thresholds({"cache_dir": str(tmp_path)}, base, ["f1"], CONFIG)
+    assert size == 2000 and feature_th["f1"]["js_divergence_gt"] == 0.003
+    assert _window_thresholds(feature_th, size, 2100, 0.1, CONFIG)["f1"]["js_divergence_gt"] == 0.003
+    assert _window_thresholds(feature_th, size, 200, 0.1, CONFIG)["f1"] == CONFIG
+    assert _feature_thresholds({"cache_dir": str(tmp_path)}, base.iloc[1:], ["f1"], CONFIG) == ({"f1": CONFIG}, None)